@@ -39,6 +39,7 @@ class args(object):
     n_steps = 1e6
     batch_size = 8
     log_interval = 1000
+    log_capacity = 10000
     save_interval = 50000
     gpu = 0
     multigpu = True
@@ -90,6 +91,12 @@ class args(object):
     mixture_components = 4
     latent_channels_DLMM = 64
 
+    # Performance
+    use_torch_compile = True        # Requires torch >= 2.0, ignored otherwise
+    use_mixed_precision = True      # bf16 autocast during training, requires torch >= 1.10 and native bf16 (Ampere+ GPU), fp32 otherwise
+    use_jit_inference = False       # Trace evaluation forward pass, once per input shape
+    checkpoint_generator = True     # Recompute generator activations in backward to save memory, requires torch >= 1.11 if distributed
+
 """
 Specialized configs
 """
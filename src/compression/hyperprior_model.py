@@ -163,8 +163,8 @@ class HyperpriorEntropyModel(entropy_models.ContinuousEntropyModel):
         indices = self.compute_indices(broadcast_shape)
 
         if len(indices.size()) < 4:
-            indices = indices.unsqueeze(0)
-            indices = torch.repeat_interleave(indices, repeats=batch_shape, dim=0)
+            # Read-only, broadcast over batch as a view rather than copying
+            indices = indices.unsqueeze(0).expand(batch_shape, -1, -1, -1)
 
         symbols = torch.floor(bottleneck + 0.5).to(torch.int32)
         rounded = symbols.clone()
@@ -224,8 +224,8 @@ class HyperpriorEntropyModel(entropy_models.ContinuousEntropyModel):
         indices = self.compute_indices(broadcast_shape)
 
         if len(indices.size()) < 4:
-            indices = indices.unsqueeze(0)
-            indices = torch.repeat_interleave(indices, repeats=batch_shape, dim=0)
+            # Read-only, broadcast over batch as a view rather than copying
+            indices = indices.unsqueeze(0).expand(batch_shape, -1, -1, -1)
 
         indices_size = tuple(indices.size())
         assert len(indices.size()) == 4, 'Expect (N,C,H,W)-format input.'
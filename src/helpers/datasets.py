@@ -13,6 +13,8 @@ import torch
 from torch.utils.data import Dataset, DataLoader
 from torchvision import transforms, datasets
 
+from src.helpers import utils
+
 DIR = os.path.abspath(os.path.dirname(__file__))
 COLOUR_BLACK = 0
 COLOUR_WHITE = 1
@@ -59,7 +61,7 @@ def get_dataloaders(dataset, mode='train', root=None, shuffle=True, pin_memory=T
     kwargs :
         Additional arguments to `DataLoader`. Default values are modified.
     """
-    pin_memory = pin_memory and torch.cuda.is_available  # only pin if GPU available
+    pin_memory = pin_memory and torch.cuda.is_available()  # only pin if GPU available
     Dataset = get_dataset(dataset)
 
     if root is None:
@@ -67,12 +69,60 @@ def get_dataloaders(dataset, mode='train', root=None, shuffle=True, pin_memory=T
     else:
         dataset = Dataset(root=root, logger=logger, mode=mode, normalize=normalize, **kwargs)
 
+    # Keep workers alive across epochs, requires torch >= 1.7
+    loader_kwargs = dict()
+    if utils.torch_version_at_least(1, 7):
+        loader_kwargs['persistent_workers'] = NUM_DATASET_WORKERS > 0
+
     return DataLoader(dataset,
                       batch_size=batch_size,
                       shuffle=shuffle,
                       num_workers=NUM_DATASET_WORKERS,
                       collate_fn=exception_collate_fn,
-                      pin_memory=pin_memory)
+                      pin_memory=pin_memory,
+                      **loader_kwargs)
+
+
+class CUDAPrefetcher(object):
+    """
+    Wraps a DataLoader yielding (images, ...) batches from pinned memory.
+    Images for the next batch are copied to `device` on a separate stream
+    while the current batch is being processed, hiding host-to-device
+    transfer latency. Remaining batch elements are left on the host.
+    """
+
+    def __init__(self, loader, device):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.stream = torch.cuda.Stream(device=self.device)
+
+    def __len__(self):
+        return len(self.loader)
+
+    def _preload(self, loader_iter):
+        try:
+            images, *rest = next(loader_iter)
+        except StopIteration:
+            return None
+
+        with torch.cuda.stream(self.stream):
+            images = images.to(self.device, dtype=torch.float, non_blocking=True)
+
+        return (images, *rest)
+
+    def __iter__(self):
+        loader_iter = iter(self.loader)
+        next_batch = self._preload(loader_iter)
+
+        while next_batch is not None:
+            current_stream = torch.cuda.current_stream(self.device)
+            current_stream.wait_stream(self.stream)
+            batch = next_batch
+            # Copy made on side stream, mark as in use on compute stream
+            batch[0].record_stream(current_stream)
+
+            next_batch = self._preload(loader_iter)
+            yield batch
 
 
 class BaseDataset(Dataset, abc.ABC):
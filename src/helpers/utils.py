@@ -8,6 +8,7 @@ import json
 import os, time, datetime
 import logging
 import itertools
+import re
 
 from collections import OrderedDict
 from torchvision.utils import save_image
@@ -18,6 +19,41 @@ class Struct:
     def __init__(self, **entries):
         self.__dict__.update(entries)
 
+class RingLogger(object):
+    """
+    Store for logged scalars. Keeps the most recent `capacity` values
+    per key in fixed-size shared memory buffers, so memory use is bounded
+    over long runs and appends are O(1).
+    """
+    def __init__(self, capacity=10000):
+        self.capacity = int(capacity)
+        self._buffers = dict()
+        self._counts = dict()
+
+    def append(self, key, value):
+        if key not in self._buffers:
+            self._buffers[key] = torch.zeros(self.capacity, dtype=torch.float64).share_memory_().numpy()
+            self._counts[key] = 0
+
+        self._buffers[key][self._counts[key] % self.capacity] = float(value)
+        self._counts[key] += 1
+
+    def keys(self):
+        return self._buffers.keys()
+
+    def __contains__(self, key):
+        return key in self._buffers
+
+    def __getitem__(self, key):
+        """ Stored values for `key`, oldest first. """
+        if key not in self._buffers:
+            return np.empty(0)
+
+        buffer, count = self._buffers[key], self._counts[key]
+        if count <= self.capacity:
+            return buffer[:count]
+        return np.roll(buffer, -(count % self.capacity))
+
 class Swish(nn.Module):
     def __init__(self):
         super(Swish, self).__init__()
@@ -31,6 +67,21 @@ def get_device(is_gpu=True):
     return torch.device("cuda" if torch.cuda.is_available() and is_gpu
                         else "cpu")
 
+def torch_version_at_least(major, minor):
+    """ Gates features newer than the minimum supported torch version (1.6). """
+    version = re.match(r'(\d+)\.(\d+)', torch.__version__)
+    return (int(version.group(1)), int(version.group(2))) >= (major, minor)
+
+def cuda_bf16_native():
+    """ True if the current CUDA device supports bf16 natively (Ampere or newer), excluding emulation. """
+    if torch.cuda.is_available() is False or hasattr(torch.cuda, 'is_bf16_supported') is False:
+        return False
+    try:
+        return torch.cuda.is_bf16_supported(including_emulation=False)
+    except TypeError:
+        # torch < 2.3 only reports native support
+        return torch.cuda.is_bf16_supported()
+
 def get_model_device(model):
     """Return the device where the model sits."""
     return next(model.parameters()).device
@@ -207,6 +258,16 @@ def load_model(save_path, logger, device, model_type=None, model_mode=None, curr
     if hasattr(args, 'sample_noise') is False:
         args.sample_noise = False
         args.noise_dim = 0
+    if hasattr(args, 'use_torch_compile') is False:
+        args.use_torch_compile = False
+    if hasattr(args, 'use_mixed_precision') is False:
+        args.use_mixed_precision = False
+    if hasattr(args, 'log_capacity') is False:
+        args.log_capacity = 10000
+    if hasattr(args, 'use_jit_inference') is False:
+        args.use_jit_inference = False
+    if hasattr(args, 'checkpoint_generator') is False:
+        args.checkpoint_generator = False
 
     model = Model(args, logger, model_type=model_type, model_mode=model_mode)
 
@@ -330,9 +391,9 @@ def log(model, storage, epoch, idx, mean_epoch_loss, current_loss, best_loss, st
         best_loss = current_loss
         improved = '[*]'  
     
-    storage['epoch'].append(epoch)
-    storage['mean_compression_loss'].append(mean_epoch_loss)
-    storage['time'].append(time.time())
+    storage.append('epoch', epoch)
+    storage.append('mean_compression_loss', mean_epoch_loss)
+    storage.append('time', time.time())
 
     # Tensorboard
     if writer is not None:
@@ -53,6 +53,7 @@ class CodingModel(nn.Module):
         self.n_channels = n_channels
         self.min_likelihood = float(min_likelihood)
         self.max_likelihood = float(max_likelihood)
+        self._n_pixels = dict()  # Cache keyed by spatial shape
 
     def _quantize(self, x, mode='noise', means=None):
         """
@@ -77,14 +78,21 @@ class CodingModel(nn.Module):
         
         return x
 
+    def n_pixels(self, spatial_shape):
+        """ Number of pixels in image of `spatial_shape` (H,W), cached per shape. """
+        spatial_shape = tuple(spatial_shape)
+        if spatial_shape not in self._n_pixels:
+            assert len(spatial_shape) == 2, 'Mispecified spatial dims'
+            self._n_pixels[spatial_shape] = np.prod(spatial_shape)
+        return self._n_pixels[spatial_shape]
+
     def _estimate_entropy(self, likelihood, spatial_shape):
 
         EPS = 1e-9  
         quotient = -np.log(2.)
         batch_size = likelihood.size()[0]
 
-        assert len(spatial_shape) == 2, 'Mispecified spatial dims'
-        n_pixels = np.prod(spatial_shape)
+        n_pixels = self.n_pixels(spatial_shape)
 
         log_likelihood = torch.log(likelihood + EPS)
         n_bits = torch.sum(log_likelihood) / (batch_size * quotient)
@@ -97,8 +105,7 @@ class CodingModel(nn.Module):
         quotient = -np.log(2.)
         batch_size = log_likelihood.size()[0]
 
-        assert len(spatial_shape) == 2, 'Mispecified spatial dims'
-        n_pixels = np.prod(spatial_shape)
+        n_pixels = self.n_pixels(spatial_shape)
 
         n_bits = torch.sum(log_likelihood) / (batch_size * quotient)
         bpp = n_bits / n_pixels
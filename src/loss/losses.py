@@ -18,14 +18,11 @@ def weighted_rate_loss(config, total_nbpp, total_qbpp, step_counter, ignore_sche
 
     target_bpp = get_scheduled_params(config.target_rate, config.target_schedule, step_counter, ignore_schedule)
 
-    total_qbpp = total_qbpp.item()
-    if total_qbpp > target_bpp:
-        rate_penalty = lambda_A
-    else:
-        rate_penalty = lambda_B
+    # Select penalty on-device rather than synchronizing on `.item()` every step
+    rate_penalty = lambda_B + (lambda_A - lambda_B) * (total_qbpp.detach() > target_bpp).float()
     weighted_rate = rate_penalty * total_nbpp
 
-    return weighted_rate, float(rate_penalty)
+    return weighted_rate, rate_penalty
 
 def _non_saturating_loss(D_real_logits, D_gen_logits, D_real=None, D_gen=None):
 
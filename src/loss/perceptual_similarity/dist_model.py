@@ -112,6 +112,11 @@ class DistModel(BaseModel):
 
         return self.net.forward(in0, in1, retPerLayer=retPerLayer)
 
+    def trace(self, input_shape):
+        ''' Trace base network for inputs of shape input_shape (N,3,H,W) '''
+        net = self.net.module if isinstance(self.net, torch.nn.DataParallel) else self.net
+        net.trace(input_shape)
+
     # ***** TRAINING FUNCTIONS *****
     def optimize_parameters(self):
         self.forward_train()
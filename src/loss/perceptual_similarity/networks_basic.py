@@ -45,6 +45,7 @@ class PNetLin(nn.Module):
         self.L = len(self.chns)
 
         self.net = net_type(pretrained=not self.pnet_rand, requires_grad=self.pnet_tune)
+        self.traced_nets = dict()  # Plain dict, not registered as submodules
 
         if(lpips):
             self.lin0 = NetLinLayer(self.chns[0], use_dropout=use_dropout)
@@ -58,10 +59,19 @@ class PNetLin(nn.Module):
                 self.lin6 = NetLinLayer(self.chns[6], use_dropout=use_dropout)
                 self.lins+=[self.lin5,self.lin6]
 
+    def trace(self, input_shape):
+        # Trace base network at fixed input shape, other shapes run eagerly
+        device = next(self.net.parameters()).device
+        example = torch.zeros(input_shape, device=device)
+        with torch.no_grad():
+            self.traced_nets[tuple(input_shape)] = torch.jit.trace(self.net, example)
+
     def forward(self, in0, in1, retPerLayer=False):
         # v0.0 - original release had a bug, where input was not scaled
         in0_input, in1_input = (self.scaling_layer(in0), self.scaling_layer(in1)) if self.version=='0.1' else (in0, in1)
-        outs0, outs1 = self.net.forward(in0_input), self.net.forward(in1_input)
+        # Traced base network if available for this input shape
+        net = self.traced_nets.get(tuple(in0_input.size()), self.net)
+        outs0, outs1 = net(in0_input), net(in1_input)
         feats0, feats1, diffs = {}, {}, {}
 
         for kk in range(self.L):
@@ -39,6 +39,13 @@ class PerceptualLoss(torch.nn.Module):
 
         return self.model.forward(target, pred)
 
+    def trace(self, input_shape):
+        """
+        Trace feature extractor with TorchScript for inputs of shape (N,3,H,W).
+        Inputs of other shapes fall back to the eager network.
+        """
+        self.model.trace(input_shape)
+
 def normalize_tensor(in_feat,eps=1e-10):
     l2_norm = torch.sum(in_feat**2,dim=1,keepdim=True) 
     norm_factor = torch.sqrt(l2_norm + eps)
@@ -2,15 +2,22 @@
 Stitches submodels together.
 """
 import numpy as np
-import time, os
+import time, os, sys
 import itertools
+import contextlib
+import platform
+import copy
 
 from functools import partial
-from collections import defaultdict, namedtuple
+from dataclasses import dataclass
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.nn.parallel import DistributedDataParallel as DDP
+from torch.utils.checkpoint import checkpoint
 
 # Custom modules
 from src import hyperprior
@@ -21,25 +28,48 @@ from src.loss.perceptual_similarity import perceptual_loss as ps
 
 from default_config import ModelModes, ModelTypes, hific_args, directories
 
-Intermediates = namedtuple("Intermediates",
-    ["input_image",             # [0, 1] (after scaling from [0, 255])
-     "reconstruction",          # [0, 1]
-     "latents_quantized",       # Latents post-quantization.
-     "n_bpp",                   # Differential entropy estimate.
-     "q_bpp"])                  # Shannon entropy estimate.
+# __slots__ generation requires python >= 3.10
+_slots = dict(slots=True) if sys.version_info >= (3, 10) else dict()
 
-Disc_out= namedtuple("disc_out",
-    ["D_real", "D_gen", "D_real_logits", "D_gen_logits"])
+@dataclass(**_slots)
+class Intermediates:
+    input_image: torch.Tensor               # [0, 1] (after scaling from [0, 255])
+    reconstruction: torch.Tensor            # [0, 1]
+    latents_quantized: torch.Tensor         # Latents post-quantization.
+    n_bpp: torch.Tensor                     # Differential entropy estimate.
+    q_bpp: torch.Tensor                     # Shannon entropy estimate.
+
+@dataclass(**_slots)
+class Disc_out:
+    D_real: torch.Tensor
+    D_gen: torch.Tensor
+    D_real_logits: torch.Tensor
+    D_gen_logits: torch.Tensor
+
+
+def postprocess_reconstruction(reconstruction, normalized=False):
+    """ Maps reconstruction to [0,1], clamping out-of-range values. """
+    if normalized is True:
+        # [-1.,1.] -> [0.,1.]
+        reconstruction = (reconstruction + 1.) / 2.
+
+    return torch.clamp(reconstruction, min=0., max=1.)
 
 
 class Model(nn.Module):
 
-    def __init__(self, args, logger, storage_train=defaultdict(list), storage_test=defaultdict(list), model_mode=ModelModes.TRAINING, 
-            model_type=ModelTypes.COMPRESSION):
+    def __init__(self, args, logger, storage_train=None, storage_test=None, model_mode=ModelModes.TRAINING, 
+            model_type=ModelTypes.COMPRESSION, gpu_id=None):
         super(Model, self).__init__()
 
         """
         Builds hific model from submodels in network.
+        If `gpu_id` is given and a process group has been initialized, each
+        submodel is wrapped in DistributedDataParallel on that device.
+
+        To overlap host -> device copies with compute, feed inputs from a DataLoader
+        with `pin_memory=True`, `num_workers >= 4`, `persistent_workers=True` (torch >= 1.7, see
+        `datasets.get_dataloaders` / `datasets.CUDAPrefetcher`).
         """
         self.args = args
         self.model_mode = model_mode
@@ -48,7 +78,14 @@ class Model(nn.Module):
         self.log_interval = args.log_interval
         self.storage_train = storage_train
         self.storage_test = storage_test
+        if storage_train is None:
+            self.storage_train = utils.RingLogger(capacity=args.log_capacity)
+        if storage_test is None:
+            self.storage_test = utils.RingLogger(capacity=args.log_capacity)
         self.step_counter = 0
+        self._pending_losses = dict()
+        self.gpu_id = gpu_id
+        self.distributed = (gpu_id is not None) and dist.is_available() and dist.is_initialized()
 
         if self.args.use_latent_mixture_model is True:
             self.args.latent_channels = self.args.latent_channels_DLMM
@@ -61,6 +98,12 @@ class Model(nn.Module):
         self.image_dims = self.args.image_dims  # Assign from dataloader
         self.batch_size = self.args.batch_size
 
+        # Loss weights held on-device. Non-persistent so that checkpoints are
+        # unchanged and current args take precedence when warmstarting
+        self.register_buffer('k_M', torch.tensor(float(self.args.k_M)), persistent=False)
+        self.register_buffer('k_P', torch.tensor(float(self.args.k_P)), persistent=False)
+        self.register_buffer('beta', torch.tensor(float(self.args.beta)), persistent=False)
+
         self.entropy_code = False
         if model_mode == ModelModes.EVALUATION:
             self.entropy_code = True
@@ -79,6 +122,13 @@ class Model(nn.Module):
             self.Hyperprior = hyperprior.Hyperprior(bottleneck_capacity=self.args.latent_channels,
                 likelihood_type=self.args.likelihood_type, entropy_code=self.entropy_code)
 
+        # Training crops have fixed spatial shape, reused across steps
+        self._spatial_shape = tuple(self.image_dims[1:])
+
+        # Inputs padded in evaluation so that spatial dims divisible by total downsampling
+        self._encoder_pad_factor = 2 ** self.Encoder.n_downsampling_layers
+        self._hyperencoder_pad_factor = 2 ** self.Hyperprior.analysis_net.n_downsampling_layers
+
         self.amortization_models = [self.Encoder, self.Generator]
         self.amortization_models.extend(self.Hyperprior.amortization_models)
 
@@ -100,20 +150,186 @@ class Model(nn.Module):
             self.discriminator_steps = 0
             self.Discriminator = None
 
-        self.squared_difference = torch.nn.MSELoss(reduction='none')
         # Expects [-1,1] images or [0,1] with normalize=True flag
-        self.perceptual_loss = ps.PerceptualLoss(model='net-lin', net='alex', use_gpu=torch.cuda.is_available(), gpu_ids=[args.gpu])
+        lpips_gpu = gpu_id if self.distributed is True else args.gpu
+        self.perceptual_loss = ps.PerceptualLoss(model='net-lin', net='alex', use_gpu=torch.cuda.is_available(), gpu_ids=[lpips_gpu])
+        if self.model_mode != ModelModes.EVALUATION:
+            # Training crops have fixed shape
+            self.perceptual_loss.trace((self.batch_size, *self.image_dims))
+
+        # NHWC layout dispatches to Tensor Core conv kernels
+        for module in [self.Encoder, self.Generator, self.Discriminator] + self.Hyperprior.amortization_models:
+            if module is not None:
+                module.to(memory_format=torch.channels_last)
+
+        # DDP wrappers share parameters with the submodels above; kept out of
+        # the module registry so checkpoints / attribute access are unaffected
+        self._ddp_modules = dict()
+        if self.distributed is True:
+            self.to(gpu_id)
+            for name in ['Encoder', 'Generator', 'Hyperprior', 'Discriminator']:
+                module = getattr(self, name)
+                if module is None:
+                    continue
+                # Unused parameters expected - D only used on alternating steps
+                self._ddp_modules[name] = DDP(module, device_ids=[gpu_id], output_device=gpu_id,
+                    find_unused_parameters=True)
+
+        # Non-reentrant checkpointing (torch >= 1.11) required to recompute DDP-wrapped
+        # generator - fall back to reentrant variant on single device for older torch
+        self._checkpoint_kwargs = dict(use_reentrant=False) if utils.torch_version_at_least(1, 11) else dict()
+        self.checkpoint_generator = (self.args.checkpoint_generator is True) and \
+            (len(self._checkpoint_kwargs) > 0 or self.distributed is False)
+
+        # bf16 has the same exponent range as fp32, no loss scaling required
+        self.use_mixed_precision = (self.args.use_mixed_precision is True) and hasattr(torch, 'autocast') \
+            and (self.model_mode != ModelModes.EVALUATION)
+        if self.use_mixed_precision is True and utils.cuda_bf16_native() is False:
+            # Pre-Ampere GPUs either raise under bf16 autocast or emulate it slower than fp32
+            self.logger.info('bf16 not natively supported on this device, training in fp32.')
+            self.use_mixed_precision = False
+
+        # Fuse elementwise ops in encoder / hyperprior / generator via TorchInductor.
+        # Training inputs are fixed-size crops, so compile for static shapes only -
+        # evaluation pads to arbitrary shapes and stays eager
+        self._compiled_modules = dict()
+        self._quantized_modules = dict()
+        self._traced_inference = dict()
+        self.use_jit_inference = (self.args.use_jit_inference is True) and (self.model_mode == ModelModes.EVALUATION)
+        self.postprocess_reconstruction = postprocess_reconstruction
+        self.use_torch_compile = (self.args.use_torch_compile is True) and hasattr(torch, 'compile')
+        if self.use_torch_compile is True:
+            if self.model_mode == ModelModes.TRAINING:
+                self._compile_submodels()
+            elif self.model_mode == ModelModes.EVALUATION:
+                self.postprocess_reconstruction = torch.compile(postprocess_reconstruction, dynamic=True)
+
+    def _get_spatial_shape(self, x):
+        """ Cached spatial shape if `x` matches training shape, otherwise (e.g. padded) from `x`. """
+        if x.shape[2:] == self._spatial_shape:
+            return self._spatial_shape
+        return tuple(x.size()[2:])
+
+    def _autocast(self, x, enabled=True):
+        """ bf16 autocast context for CUDA inputs if mixed precision enabled, else no-op. """
+        if self.use_mixed_precision is False or x.is_cuda is False:
+            return contextlib.nullcontext()
+        return torch.autocast(device_type='cuda', dtype=torch.bfloat16, enabled=enabled)
+
+    def _compile_submodels(self):
+        torch._dynamo.config.cache_size_limit = 16
+        compile_kwargs = dict(mode='max-autotune', fullgraph=False, dynamic=False)
+
+        for name in ['Encoder', 'Generator']:
+            self._compiled_modules[name] = torch.compile(self._submodel(name), **compile_kwargs)
+
+        # Hyperprior analysis/synthesis transforms are called from within the
+        # Hyperprior forward - compile in-place to preserve state_dict keys
+        for net in self.Hyperprior.amortization_models:
+            if hasattr(net, 'compile'):
+                net.compile(**compile_kwargs)
+
+    def _submodel(self, name):
+        """ Returns quantized / compiled / DDP-wrapped submodel if available. """
+        if name in self._quantized_modules:
+            return self._quantized_modules[name]
+        if name in self._compiled_modules:
+            return self._compiled_modules[name]
+        return self._ddp_modules.get(name, getattr(self, name))
+
+    def _no_sync(self, names):
+        """ Disables gradient allreduce for the given submodels, if distributed. """
+        stack = contextlib.ExitStack()
+        for name in names:
+            if name in self._ddp_modules:
+                stack.enter_context(self._ddp_modules[name].no_sync())
+        return stack
         
+    def quantize_for_inference(self, calib_loader, n_calibration=100):
+        """
+        INT8 post-training static quantization of the Encoder and Generator
+        for CPU inference. Hyperprior entropy model is kept in fp32.
+
+        calib_loader:   Iterable yielding batches (x, ...) of calibration
+                        images in the same format as the model input.
+        n_calibration:  Number of images used to calibrate activation ranges.
+
+        Requires torch >= 1.13.
+        """
+        assert utils.torch_version_at_least(1, 13), 'FX graph mode quantization requires torch >= 1.13.'
+        assert self.model_mode == ModelModes.EVALUATION and (self.training is False), (
+            f'Set model mode to {ModelModes.EVALUATION} for quantization.')
+        assert utils.get_model_device(self).type == 'cpu', 'Quantized kernels require model on CPU.'
+
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+        engine = 'qnnpack' if platform.machine().lower() in ('arm64', 'aarch64') else 'fbgemm'
+        torch.backends.quantized.engine = engine
+        qconfig_mapping = get_default_qconfig_mapping(engine)
+
+        names = ['Encoder', 'Generator']
+        if self.args.sample_noise is True:
+            # Noise sampling depends on runtime shapes, not FX-traceable
+            self.logger.warning('Generator noise sampling enabled, only quantizing Encoder.')
+            names = ['Encoder']
+
+        self._quantized_modules = dict()
+        self._traced_inference = dict()
+        calibration_batches = list()
+        n_images = 0
+        for batch in calib_loader:
+            x = batch[0] if isinstance(batch, (list, tuple)) else batch
+            calibration_batches.append(x.float())
+            n_images += x.size(0)
+            if n_images >= n_calibration:
+                break
+
+        with torch.no_grad():
+            # Example inputs for tracing from a single fp32 pass
+            intermediates, _ = self.compression_forward(calibration_batches[0])
+            example_inputs = dict(Encoder=(intermediates.input_image,),
+                Generator=(intermediates.latents_quantized,))
+
+            # Insert observers, calibrate on `n_calibration` images
+            prepared = dict((name, prepare_fx(copy.deepcopy(getattr(self, name)).eval(), qconfig_mapping,
+                example_inputs[name])) for name in names)
+            self._quantized_modules = prepared
+            for x in calibration_batches:
+                self.compression_forward(x)
+
+        self._quantized_modules = dict((name, convert_fx(module)) for name, module in prepared.items())
+        self.logger.info(f'Quantized {names} to INT8 using {engine} backend, calibrated on {n_images} images.')
+
+    def _writeout_enabled(self):
+        # Only log from rank 0 process
+        if self.distributed is True and self.gpu_id != 0:
+            return False
+        return self.writeout is True
+
     def store_loss(self, key, loss):
-        assert type(loss) == float, 'Call .item() on loss before storage'
+        if self._writeout_enabled() is False:
+            return
 
         if self.training is True:
             storage = self.storage_train
         else:
             storage = self.storage_test
 
-        if self.writeout is True:
-            storage[key].append(loss)
+        storage.append(key, loss)
+
+
+    def store_losses(self, losses):
+        """
+        Stores dict of scalar tensors with a single device -> host transfer,
+        rather than synchronizing on `.item()` for each.
+        """
+        if self._writeout_enabled() is False or len(losses) == 0:
+            return
+
+        values = torch.stack([loss.detach().float() for loss in losses.values()]).cpu().tolist()
+        for key, value in zip(losses.keys(), values):
+            self.store_loss(key, value)
 
 
     def compression_forward(self, x):
@@ -126,46 +342,49 @@ class Model(nn.Module):
             torch.Tensor
         
         Outputs
-        intermediates: NamedTuple of intermediate values
+        intermediates: Intermediates dataclass of intermediate values
         """
-        image_dims = tuple(x.size()[1:])  # (C,H,W)
+        spatial_shape = x.shape[2:]  # (H,W)
+        x = x.contiguous(memory_format=torch.channels_last)
 
         if self.model_mode == ModelModes.EVALUATION and (self.training is False):
-            n_encoder_downsamples = self.Encoder.n_downsampling_layers
-            factor = 2 ** n_encoder_downsamples
-            x = utils.pad_factor(x, x.size()[2:], factor)
+            x = utils.pad_factor(x, x.size()[2:], self._encoder_pad_factor)
 
         # Encoder forward pass
-        y = self.Encoder(x)
+        y = self._submodel('Encoder')(x)
 
         if self.model_mode == ModelModes.EVALUATION and (self.training is False):
-            n_hyperencoder_downsamples = self.Hyperprior.analysis_net.n_downsampling_layers
-            factor = 2 ** n_hyperencoder_downsamples
-            y = utils.pad_factor(y, y.size()[2:], factor)
+            y = utils.pad_factor(y, y.size()[2:], self._hyperencoder_pad_factor)
 
-        hyperinfo = self.Hyperprior(y, spatial_shape=x.size()[2:])
+        # Rate estimation sensitive to precision, keep entropy model in fp32
+        with self._autocast(y, enabled=False):
+            hyperinfo = self._submodel('Hyperprior')(y.float(), spatial_shape=self._get_spatial_shape(x))
 
         latents_quantized = hyperinfo.decoded
         total_nbpp = hyperinfo.total_nbpp
         total_qbpp = hyperinfo.total_qbpp
 
         # Use quantized latents as input to G
-        reconstruction = self.Generator(latents_quantized)
+        if self.checkpoint_generator is True and self.training is True and torch.is_grad_enabled():
+            # Recompute G activations in backward pass rather than storing them
+            reconstruction = checkpoint(self._submodel('Generator'), latents_quantized, **self._checkpoint_kwargs)
+        else:
+            reconstruction = self._submodel('Generator')(latents_quantized)
         
         if self.args.normalize_input_image is True:
             reconstruction = torch.tanh(reconstruction)
 
         # Undo padding
         if self.model_mode == ModelModes.EVALUATION and (self.training is False):
-            reconstruction = reconstruction[:, :, :image_dims[1], :image_dims[2]]
+            reconstruction = reconstruction[:, :, :spatial_shape[0], :spatial_shape[1]]
         
-        intermediates = Intermediates(x, reconstruction, latents_quantized, 
-            total_nbpp, total_qbpp)
+        intermediates = Intermediates(input_image=x, reconstruction=reconstruction,
+            latents_quantized=latents_quantized, n_bpp=total_nbpp, q_bpp=total_qbpp)
 
         return intermediates, hyperinfo
 
     def discriminator_forward(self, intermediates, train_generator):
-        """ Train on gen/real batches simultaneously. """
+        """ Train on gen/real batches in separate passes, avoids concatenating them. """
         x_gen = intermediates.reconstruction
         x_real = intermediates.input_image
 
@@ -173,25 +392,37 @@ class Model(nn.Module):
         if train_generator is False:
             x_gen = x_gen.detach()
 
-        D_in = torch.cat([x_real, x_gen], dim=0)
+        x_real = x_real.contiguous(memory_format=torch.channels_last)
+        x_gen = x_gen.contiguous(memory_format=torch.channels_last)
 
         latents = intermediates.latents_quantized.detach()
-        latents = torch.repeat_interleave(latents, 2, dim=0)
+        Discriminator = self._submodel('Discriminator')
 
-        D_out, D_out_logits = self.Discriminator(D_in, latents)
-        D_out = torch.squeeze(D_out)
-        D_out_logits = torch.squeeze(D_out_logits)
+        # Under DDP, gradients from both passes reduced in a single allreduce
+        with self._no_sync(['Discriminator']):
+            D_real, D_real_logits = Discriminator(x_real, latents)
 
-        D_real, D_gen = torch.chunk(D_out, 2, dim=0)
-        D_real_logits, D_gen_logits = torch.chunk(D_out_logits, 2, dim=0)
+        # Spectral norm power iteration runs on training-mode forward passes only -
+        # score generated batch with the same normalized weights as the real batch
+        D_training = self.Discriminator.training
+        self.Discriminator.eval()
+        try:
+            D_gen, D_gen_logits = Discriminator(x_gen, latents)
+        finally:
+            self.Discriminator.train(D_training)
 
-        return Disc_out(D_real, D_gen, D_real_logits, D_gen_logits)
+        D_real, D_real_logits = torch.squeeze(D_real), torch.squeeze(D_real_logits)
+        D_gen, D_gen_logits = torch.squeeze(D_gen), torch.squeeze(D_gen_logits)
+
+        return Disc_out(D_real=D_real, D_gen=D_gen, D_real_logits=D_real_logits,
+            D_gen_logits=D_gen_logits)
 
     def distortion_loss(self, x_gen, x_real):
         # loss in [0,255] space but normalized by 255 to not be too big
         # - Delegate scaling to weighting
-        sq_err = self.squared_difference(x_gen*255., x_real*255.) # / 255.
-        return torch.mean(sq_err)
+        # Equivalent to MSE on inputs scaled by 255, without materializing them.
+        # Computed in fp32 under mixed precision
+        return F.mse_loss(x_gen.float(), x_real.float()) * (255.**2)
 
     def perceptual_loss_wrapper(self, x_gen, x_real, normalize=True):
         """ Assumes inputs are in [0, 1] if normalize=True, else [-1, 1] """
@@ -211,8 +442,8 @@ class Model(nn.Module):
         distortion_loss = self.distortion_loss(x_gen, x_real)
         perceptual_loss = self.perceptual_loss_wrapper(x_gen, x_real, normalize=True)
 
-        weighted_distortion = self.args.k_M * distortion_loss
-        weighted_perceptual = self.args.k_P * perceptual_loss
+        weighted_distortion = self.k_M * distortion_loss
+        weighted_perceptual = self.k_P * perceptual_loss
 
         weighted_rate, rate_penalty = losses.weighted_rate_loss(self.args, total_nbpp=intermediates.n_bpp,
             total_qbpp=intermediates.q_bpp, step_counter=self.step_counter, ignore_schedule=self.args.ignore_schedule)
@@ -222,21 +453,21 @@ class Model(nn.Module):
 
         # Bookkeeping 
         if (self.step_counter % self.log_interval == 1):
-            self.store_loss('rate_penalty', rate_penalty)
-            self.store_loss('distortion', distortion_loss.item())
-            self.store_loss('perceptual', perceptual_loss.item())
-            self.store_loss('n_rate', intermediates.n_bpp.item())
-            self.store_loss('q_rate', intermediates.q_bpp.item())
-            self.store_loss('n_rate_latent', hyperinfo.latent_nbpp.item())
-            self.store_loss('q_rate_latent', hyperinfo.latent_qbpp.item())
-            self.store_loss('n_rate_hyperlatent', hyperinfo.hyperlatent_nbpp.item())
-            self.store_loss('q_rate_hyperlatent', hyperinfo.hyperlatent_qbpp.item())
-
-            self.store_loss('weighted_rate', weighted_rate.item())
-            self.store_loss('weighted_distortion', weighted_distortion.item())
-            self.store_loss('weighted_perceptual', weighted_perceptual.item())
-            self.store_loss('weighted_R_D', weighted_R_D_loss.item())
-            self.store_loss('weighted_compression_loss_sans_G', weighted_compression_loss.item())
+            self._pending_losses.update(dict(
+                rate_penalty=rate_penalty,
+                distortion=distortion_loss,
+                perceptual=perceptual_loss,
+                n_rate=intermediates.n_bpp,
+                q_rate=intermediates.q_bpp,
+                n_rate_latent=hyperinfo.latent_nbpp,
+                q_rate_latent=hyperinfo.latent_qbpp,
+                n_rate_hyperlatent=hyperinfo.hyperlatent_nbpp,
+                q_rate_hyperlatent=hyperinfo.hyperlatent_qbpp,
+                weighted_rate=weighted_rate,
+                weighted_distortion=weighted_distortion,
+                weighted_perceptual=weighted_perceptual,
+                weighted_R_D=weighted_R_D_loss,
+                weighted_compression_loss_sans_G=weighted_compression_loss))
 
         return weighted_compression_loss
 
@@ -251,11 +482,12 @@ class Model(nn.Module):
 
         # Bookkeeping 
         if (self.step_counter % self.log_interval == 1):
-            self.store_loss('D_gen', torch.mean(disc_out.D_gen).item())
-            self.store_loss('D_real', torch.mean(disc_out.D_real).item())
-            self.store_loss('disc_loss', D_loss.item())
-            self.store_loss('gen_loss', G_loss.item())
-            self.store_loss('weighted_gen_loss', (self.args.beta * G_loss).item())
+            self._pending_losses.update(dict(
+                D_gen=torch.mean(disc_out.D_gen),
+                D_real=torch.mean(disc_out.D_real),
+                disc_loss=D_loss,
+                gen_loss=G_loss,
+                weighted_gen_loss=self.beta * G_loss))
 
         return D_loss, G_loss
 
@@ -275,19 +507,16 @@ class Model(nn.Module):
             f'Set model mode to {ModelModes.EVALUATION} for compression.')
         
         spatial_shape = tuple(x.size()[2:])
+        x = x.contiguous(memory_format=torch.channels_last)
 
         if self.model_mode == ModelModes.EVALUATION and (self.training is False):
-            n_encoder_downsamples = self.Encoder.n_downsampling_layers
-            factor = 2 ** n_encoder_downsamples
-            x = utils.pad_factor(x, x.size()[2:], factor)
+            x = utils.pad_factor(x, x.size()[2:], self._encoder_pad_factor)
 
         # Encoder forward pass
-        y = self.Encoder(x)
+        y = self._submodel('Encoder')(x)
 
         if self.model_mode == ModelModes.EVALUATION and (self.training is False):
-            n_hyperencoder_downsamples = self.Hyperprior.analysis_net.n_downsampling_layers
-            factor = 2 ** n_hyperencoder_downsamples
-            y = utils.pad_factor(y, y.size()[2:], factor)
+            y = utils.pad_factor(y, y.size()[2:], self._hyperencoder_pad_factor)
 
         compression_output = self.Hyperprior.compress_forward(y, spatial_shape)
         attained_hbpp = 32 * len(compression_output.hyperlatents_encoded) / np.prod(spatial_shape)
@@ -326,7 +555,7 @@ class Model(nn.Module):
         latents_decoded = self.Hyperprior.decompress_forward(compression_output, device=utils.get_device())
 
         # Use quantized latents as input to G
-        reconstruction = self.Generator(latents_decoded)
+        reconstruction = self._submodel('Generator')(latents_decoded)
 
         if self.args.normalize_input_image is True:
             reconstruction = torch.tanh(reconstruction)
@@ -334,61 +563,111 @@ class Model(nn.Module):
         # Undo padding
         image_dims = compression_output.spatial_shape
         reconstruction = reconstruction[:, :, :image_dims[0], :image_dims[1]]
+        reconstruction = self.postprocess_reconstruction(reconstruction,
+            normalized=self.args.normalize_input_image)
 
-        if self.args.normalize_input_image is True:
-            # [-1.,1.] -> [0.,1.]
-            reconstruction = (reconstruction + 1.) / 2.
+        return reconstruction
+
+    def inference(self, x):
+        """
+        Feed-forward reconstruction in EVALUATION mode, without entropy coding.
+        Returns reconstruction in [0,1] and Shannon entropy estimate of rate.
+        """
+        intermediates, _ = self.compression_forward(x)
+        # Uncompiled variant - torch.compile output is not traceable
+        reconstruction = postprocess_reconstruction(intermediates.reconstruction,
+            normalized=self.args.normalize_input_image)
+        return reconstruction, intermediates.q_bpp
 
-        reconstruction = torch.clamp(reconstruction, min=0., max=1.)
+    def jit_inference(self, x):
+        """
+        TorchScript-traced `inference`. Padding / rate normalization depend on
+        the input shape, so a trace is built and warmed up once per shape.
+        """
+        shape = tuple(x.size())
 
-        return reconstruction
+        with torch.no_grad(), torch.jit.optimized_execution(True):
+            if shape not in self._traced_inference:
+                # Bound methods can't be passed to `torch.jit.trace`, trace as module method.
+                # Noisy rate estimate is nondeterministic, skip trace check
+                traced_model = torch.jit.trace_module(self, dict(inference=(x,)), check_trace=False)
+                traced_model.inference(x)  # Warmup - profiling executor optimizes on early calls
+                self._traced_inference[shape] = traced_model
+
+            return self._traced_inference[shape].inference(x)
 
     def forward(self, x, train_generator=False, return_intermediates=False, writeout=True):
 
         self.writeout = writeout
 
+        device = utils.get_model_device(self)
+        if x.device != device:
+            x = x.to(device, non_blocking=True)
+
+        if self.use_jit_inference is True and (self.training is False):
+            return self.jit_inference(x)
+
         losses = dict()
+        self._pending_losses = dict()
         if train_generator is True:
             # Define a 'step' as one cycle of G-D training
             self.step_counter += 1
 
-        intermediates, hyperinfo = self.compression_forward(x)
+        # Compression models not updated on discriminator-only steps, skip allreduce
+        sync_context = contextlib.ExitStack()
+        if self.use_discriminator is True and train_generator is False:
+            sync_context = self._no_sync(['Encoder', 'Hyperprior', 'Generator'])
 
-        if self.model_mode == ModelModes.EVALUATION:
+        with self._autocast(x):
+            with sync_context:
+                intermediates, hyperinfo = self.compression_forward(x)
 
-            reconstruction = intermediates.reconstruction
-            
-            if self.args.normalize_input_image is True:
-                # [-1.,1.] -> [0.,1.]
-                reconstruction = (reconstruction + 1.) / 2.
-                
-            reconstruction = torch.clamp(reconstruction, min=0., max=1.)
-            return reconstruction, intermediates.q_bpp
+            if self.model_mode == ModelModes.EVALUATION:
 
-        compression_model_loss = self.compression_loss(intermediates, hyperinfo)
+                reconstruction = self.postprocess_reconstruction(intermediates.reconstruction,
+                    normalized=self.args.normalize_input_image)
+                return reconstruction, intermediates.q_bpp
 
-        if self.use_discriminator is True:
-            # Only send gradients to generator when training generator via
-            # `train_generator` flag
-            D_loss, G_loss = self.GAN_loss(intermediates, train_generator)
-            weighted_G_loss = self.args.beta * G_loss
-            compression_model_loss += weighted_G_loss
-            losses['disc'] = D_loss
+            compression_model_loss = self.compression_loss(intermediates, hyperinfo)
+            del hyperinfo  # Rate terms retained via compression loss graph only
+
+            if self.use_discriminator is True:
+                # Only send gradients to generator when training generator via
+                # `train_generator` flag
+                D_loss, G_loss = self.GAN_loss(intermediates, train_generator)
+                weighted_G_loss = self.beta * G_loss
+                compression_model_loss += weighted_G_loss
+                losses['disc'] = D_loss
         
         losses['compression'] = compression_model_loss
 
         # Bookkeeping 
         if (self.step_counter % self.log_interval == 1):
-            self.store_loss('weighted_compression_loss', compression_model_loss.item())
+            # Flush all scalars logged this step with a single sync
+            self._pending_losses['weighted_compression_loss'] = compression_model_loss
+            self.store_losses(self._pending_losses)
+            self._pending_losses = dict()
 
         if return_intermediates is True:
             return losses, intermediates
         else:
             return losses
 
-if __name__ == '__main__':
+def _main(rank, world_size, compress_test=False):
 
-    compress_test = False
+    distributed = world_size > 1
+
+    if distributed is True:
+        # One process per GPU
+        os.environ.setdefault('MASTER_ADDR', 'localhost')
+        os.environ.setdefault('MASTER_PORT', '12355')
+        dist.init_process_group('nccl', rank=rank, world_size=world_size)
+        torch.cuda.set_device(rank)
+        device = rank
+        gpu_id = rank
+    else:
+        device = utils.get_device()
+        gpu_id = None
 
     if compress_test is True:
         model_mode = ModelModes.EVALUATION
@@ -396,53 +675,54 @@ if __name__ == '__main__':
         model_mode = ModelModes.TRAINING
 
     logger = utils.logger_setup(logpath=os.path.join(directories.experiments, 'logs'), filepath=os.path.abspath(__file__))
-    device = utils.get_device()
-    logger.info(f'Using device {device}')
-    storage_train = defaultdict(list)
-    storage_test = defaultdict(list)
+    logger.info(f'Using device {device}, rank {rank} / {world_size}')
+    storage_train = utils.RingLogger(capacity=hific_args.log_capacity)
+    storage_test = utils.RingLogger(capacity=hific_args.log_capacity)
 
-    model = Model(hific_args, logger, storage_train, storage_test, model_mode=model_mode, model_type=ModelTypes.COMPRESSION_GAN)
+    model = Model(hific_args, logger, storage_train, storage_test, model_mode=model_mode, model_type=ModelTypes.COMPRESSION_GAN,
+        gpu_id=gpu_id)
     model.to(device)
 
-    logger.info(model)
-
-    transform_param_names = list()
-    transform_params = list()
-    logger.info('ALL PARAMETERS')
-    for n, p in model.named_parameters():
-        if ('Encoder' in n) or ('Generator' in n):
-            transform_param_names.append(n)
-            transform_params.append(p)
-        if ('analysis' in n) or ('synthesis' in n):
-            transform_param_names.append(n)
-            transform_params.append(p)      
-        logger.info(f'{n} - {p.shape}')
-
-    logger.info('AMORTIZATION PARAMETERS')
-    amortization_named_parameters = itertools.chain.from_iterable(
-            [am.named_parameters() for am in model.amortization_models])
-    for n, p in amortization_named_parameters:
-        logger.info(f'{n} - {p.shape}')
-
-    logger.info('AMORTIZATION PARAMETERS')
-    for n, p in zip(transform_param_names, transform_params):
-        logger.info(f'{n} - {p.shape}')
-
-    logger.info('HYPERPRIOR PARAMETERS')
-    for n, p in model.Hyperprior.hyperlatent_likelihood.named_parameters():
-        logger.info(f'{n} - {p.shape}')
-
-    if compress_test is False:
-        logger.info('DISCRIMINATOR PARAMETERS')
-        for n, p in model.Discriminator.named_parameters():
+    if rank == 0:
+        logger.info(model)
+
+        transform_param_names = list()
+        transform_params = list()
+        logger.info('ALL PARAMETERS')
+        for n, p in model.named_parameters():
+            if ('Encoder' in n) or ('Generator' in n):
+                transform_param_names.append(n)
+                transform_params.append(p)
+            if ('analysis' in n) or ('synthesis' in n):
+                transform_param_names.append(n)
+                transform_params.append(p)      
             logger.info(f'{n} - {p.shape}')
 
-    logger.info("Number of trainable parameters: {}".format(utils.count_parameters(model)))
-    logger.info("Estimated size: {} MB".format(utils.count_parameters(model) * 4. / 10**6))
+        logger.info('AMORTIZATION PARAMETERS')
+        amortization_named_parameters = itertools.chain.from_iterable(
+                [am.named_parameters() for am in model.amortization_models])
+        for n, p in amortization_named_parameters:
+            logger.info(f'{n} - {p.shape}')
+
+        logger.info('AMORTIZATION PARAMETERS')
+        for n, p in zip(transform_param_names, transform_params):
+            logger.info(f'{n} - {p.shape}')
+
+        logger.info('HYPERPRIOR PARAMETERS')
+        for n, p in model.Hyperprior.hyperlatent_likelihood.named_parameters():
+            logger.info(f'{n} - {p.shape}')
+
+        if compress_test is False:
+            logger.info('DISCRIMINATOR PARAMETERS')
+            for n, p in model.Discriminator.named_parameters():
+                logger.info(f'{n} - {p.shape}')
+
+        logger.info("Number of trainable parameters: {}".format(utils.count_parameters(model)))
+        logger.info("Estimated size: {} MB".format(utils.count_parameters(model) * 4. / 10**6))
 
     B = 10
     shape = [B, 3, 256, 256]
-    x = torch.randn(shape).to(device)
+    x = torch.randn(shape, pin_memory=torch.cuda.is_available()).to(device, non_blocking=True)
 
     start_time = time.time()
 
@@ -462,3 +742,16 @@ if __name__ == '__main__':
 
     logger.info('Delta t {:.3f}s'.format(time.time() - start_time))
 
+    if distributed is True:
+        dist.destroy_process_group()
+
+
+if __name__ == '__main__':
+
+    compress_test = False
+    world_size = torch.cuda.device_count()
+
+    if world_size > 1 and compress_test is False:
+        mp.spawn(_main, args=(world_size, compress_test), nprocs=world_size, join=True)
+    else:
+        _main(0, 1, compress_test)
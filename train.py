@@ -14,7 +14,6 @@ import logging, pickle, argparse
 import functools, itertools
 
 from tqdm import tqdm, trange
-from collections import defaultdict
 
 import torch
 import torchvision
@@ -101,6 +100,11 @@ def train(args, model, train_loader, test_loader, device, logger, optimizers):
         disc_opt = optimizers['disc']
 
 
+    # Overlap host -> device copy of next batch with current step
+    train_batches = train_loader
+    if torch.device(device).type == 'cuda':
+        train_batches = datasets.CUDAPrefetcher(train_loader, device)
+
     for epoch in trange(args.n_epochs, desc='Epoch'):
 
         epoch_loss, epoch_test_loss = [], []  
@@ -111,9 +115,9 @@ def train(args, model, train_loader, test_loader, device, logger, optimizers):
         
         model.train()
 
-        for idx, (data, bpp) in enumerate(tqdm(train_loader, desc='Train'), 0):
+        for idx, (data, bpp) in enumerate(tqdm(train_batches, desc='Train'), 0):
 
-            data = data.to(device, dtype=torch.float)
+            data = data.to(device, dtype=torch.float, non_blocking=True)
             
             try:
                 if model.use_discriminator is True:
@@ -221,6 +225,7 @@ if __name__ == '__main__':
     general.add_argument("-multigpu", "--multigpu", help="Toggle data parallel capability using torch DataParallel", action="store_true")
     general.add_argument("-norm", "--normalize_input_image", help="Normalize input images to [-1,1]", action="store_true")
     general.add_argument('-bs', '--batch_size', type=int, default=16, help='input batch size for training')
+    general.add_argument("-log_cap", "--log_capacity", type=int, default=10000, help="Number of most recent values retained per logged scalar.")
     general.add_argument('--save', type=str, default='experiments', help='Parent directory for stored information (checkpoints, logs, etc.)')
     general.add_argument("-lt", "--likelihood_type", choices=('gaussian', 'logistic'), default='gaussian', help="Likelihood model for latents.")
     general.add_argument("-force_gpu", "--force_set_gpu", help="Set GPU to given ID", action="store_true")
@@ -268,8 +273,8 @@ if __name__ == '__main__':
     args.lambda_A = args.lambda_A_map[args.regime]
     args.n_steps = int(args.n_steps)
 
-    storage = defaultdict(list)
-    storage_test = defaultdict(list)
+    storage = utils.RingLogger(capacity=args.log_capacity)
+    storage_test = utils.RingLogger(capacity=args.log_capacity)
     logger = utils.logger_setup(logpath=os.path.join(args.snapshot, 'logs'), filepath=os.path.abspath(__file__))
 
     if args.warmstart is True: